@@ -13,16 +13,28 @@ from __future__ import annotations
 
 import os
 import sys
-import time
+import json
+import math
 import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Any, Dict, Iterable, List, Optional, Tuple
-from datetime import datetime, timedelta
+from functools import lru_cache
+from operator import itemgetter
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+from datetime import datetime, timedelta, timezone
 
 import requests
-from dateutil import parser as dtparser
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from zoneinfo import ZoneInfo
 
+try:
+    import orjson  # optional: much faster decoding of large submission pages
+except ImportError:
+    orjson = None
+
 
 # ----------------------------
 # Configuration
@@ -36,7 +48,7 @@ class Config:
 
     grace_days: int = 1
     window_days: int = 7
-    assignment_group_id: Optional[str] = None
+    assignment_group_id: Optional[int] = None
 
     dry_run: bool = True
     log_level: str = "INFO"
@@ -50,6 +62,20 @@ class Config:
     # If true, update only when assignment grading_type is complete_incomplete
     require_complete_incomplete: bool = True
 
+    # Submission listing requests in flight against Canvas at the same time.
+    max_workers: int = 8
+
+    # SQLite file for cached Canvas pages (ETag / Last-Modified); None disables caching.
+    cache_db: Optional[str] = None
+
+    # If true, skip fetching submissions for assignments a previous run found fully graded
+    # and that show no new activity. Faster, but see README for what it can miss.
+    skip_unchanged: bool = False
+
+    # A snapshot older than this no longer justifies a skip; bounds how long a hand-edited
+    # or cleared grade can go unnoticed.
+    skip_unchanged_max_age_hours: int = 24
+
 
 def env_bool(name: str, default: bool) -> bool:
     v = os.getenv(name)
@@ -76,12 +102,16 @@ def load_config() -> Config:
         course_id=course_id,
         grace_days=int(os.getenv("GRACE_DAYS", "1")),
         window_days=int(os.getenv("WINDOW_DAYS", "7")),
-        assignment_group_id=os.getenv("ASSIGNMENT_GROUP_ID") or None,
+        assignment_group_id=int(os.getenv("ASSIGNMENT_GROUP_ID")) if os.getenv("ASSIGNMENT_GROUP_ID") else None,
         dry_run=env_bool("DRY_RUN", True),
         log_level=os.getenv("LOG_LEVEL", "INFO").upper(),
         timezone=os.getenv("TIMEZONE", "America/Denver"),
         enforce_thursday_5pm=env_bool("ENFORCE_THURSDAY_5PM", False),
         require_complete_incomplete=env_bool("REQUIRE_COMPLETE_INCOMPLETE", True),
+        max_workers=max(1, int(os.getenv("MAX_WORKERS", "8"))),
+        cache_db=os.getenv("CACHE_DB", "").strip() or None,
+        skip_unchanged=env_bool("SKIP_UNCHANGED", False),
+        skip_unchanged_max_age_hours=int(os.getenv("SKIP_UNCHANGED_MAX_AGE_HOURS", "24")),
     )
 
 
@@ -98,61 +128,164 @@ def setup_logging(level: str) -> None:
     )
 
 
+# ----------------------------
+# Response Cache
+# ----------------------------
+
+@dataclass(frozen=True)
+class CachedPage:
+    etag: Optional[str]
+    last_modified: Optional[str]
+    body: bytes
+    next_url: Optional[str]
+
+
+class CacheStore:
+    """Canvas GET pages persisted in SQLite, keyed by full URL, for conditional requests.
+
+    Cached bodies include student names and submission data, so the file is kept owner-only.
+    """
+
+    def __init__(self, path: str) -> None:
+        # Pages are fetched from worker threads, so share one connection behind a lock.
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            os.chmod(path, 0o600)
+        self._lock = threading.Lock()
+        # URLs looked up during this run; everything else is dropped by prune_pages().
+        self._seen: Set[str] = set()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, body BLOB NOT NULL, next_url TEXT)"
+            )
+            # One row per assignment a run last found fully graded, recording what it looked
+            # like then: the assignment's updated_at, the course's student count, and when.
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS snapshot ("
+                "assignment_id INTEGER PRIMARY KEY, updated_at TEXT, student_count INTEGER, taken_at TEXT NOT NULL)"
+            )
+
+    def get(self, url: str) -> Optional[CachedPage]:
+        with self._lock:
+            self._seen.add(url)
+            row = self._conn.execute(
+                "SELECT etag, last_modified, body, next_url FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+        return CachedPage(*row) if row else None
+
+    def put(self, url: str, page: CachedPage) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (url, etag, last_modified, body, next_url) VALUES (?, ?, ?, ?, ?)",
+                (url, page.etag, page.last_modified, page.body, page.next_url),
+            )
+
+    def prune_pages(self) -> None:
+        """Delete cached pages this run did not request, so the file only holds current data."""
+        with self._lock, self._conn:
+            stale = [(url,) for (url,) in self._conn.execute("SELECT url FROM pages") if url not in self._seen]
+            self._conn.executemany("DELETE FROM pages WHERE url = ?", stale)
+
+    def has_pending(self, assignment_id: int, updated_at: Optional[str], student_count: Optional[int], max_age: timedelta) -> bool:
+        """True unless a snapshot younger than max_age shows this assignment fully graded for the
+        same assignment version (updated_at) and the same number of students."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT updated_at, student_count, taken_at FROM snapshot WHERE assignment_id = ?", (assignment_id,)
+            ).fetchone()
+        if row is None or not updated_at or student_count is None:
+            return True
+        snapshot_updated_at, snapshot_students, taken_at = row
+        if datetime.now(timezone.utc) - datetime.fromisoformat(taken_at) > max_age:
+            return True
+        return snapshot_students != student_count or snapshot_updated_at is None or updated_at > snapshot_updated_at
+
+    def save_snapshot(self, assignment_id: int, updated_at: Optional[str], student_count: Optional[int]) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO snapshot (assignment_id, updated_at, student_count, taken_at) VALUES (?, ?, ?, ?)",
+                (assignment_id, updated_at, student_count, datetime.now(timezone.utc).isoformat()),
+            )
+
+    def clear_snapshot(self, assignment_id: int) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM snapshot WHERE assignment_id = ?", (assignment_id,))
+
+
 # ----------------------------
 # Canvas API Client
 # ----------------------------
 
+# Assignment ids per bulk submissions request; keeps the query string well under URL limits.
+SUBMISSIONS_CHUNK_SIZE = 30
+
+# Seconds to sleep before the Nth consecutive retry (absent a Retry-After header), capped at 60s.
+_BACKOFF = (0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 60.0)
+
+
+# Decodes every Canvas response body, cached or live.
+def json_loads(body: bytes) -> Any:
+    return orjson.loads(body) if orjson is not None else json.loads(body)
+
+
+class _ScheduledRetry(Retry):
+    def get_backoff_time(self) -> float:
+        if not self.history:
+            return 0
+        return _BACKOFF[min(len(self.history), len(_BACKOFF)) - 1]
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        # Raises MaxRetryError once retries are exhausted; otherwise log what is about to happen,
+        # since the adapter sleeps silently before the next attempt.
+        new_retry = super().increment(method, url, response, error, _pool, _stacktrace)
+        cause = f"status {response.status}" if response is not None else f"error ({error})"
+        retry_after = new_retry.get_retry_after(response) if response is not None else None
+        sleep_s = retry_after if retry_after is not None else new_retry.get_backoff_time()
+        logging.warning(
+            f"{method} {url} failed with {cause}; retrying in {sleep_s:.1f}s (retry {len(new_retry.history)})"
+        )
+        return new_retry
+
+
 class CanvasClient:
-    def __init__(self, base_url: str, token: str, timeout: int = 30) -> None:
+    def __init__(self, base_url: str, token: str, timeout: int = 30, cache: CacheStore | None = None, pool_size: int = 32) -> None:
         self.base_url = base_url.rstrip("/")
+        self.cache = cache
         self.session = requests.Session()
         self.session.headers.update({
             "Authorization": f"Bearer {token}",
             "Accept": "application/json",
         })
+        # Rate limits, transient 5xx and connection errors are retried inside the
+        # adapter on the _BACKOFF schedule, honoring Retry-After on 429/503.
+        retry = _ScheduledRetry(
+            total=8,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=frozenset(["GET", "PUT", "POST"]),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        # The default adapter keeps only 10 connections per host, fewer than the
+        # fetch workers can have in flight; size it so they all reuse keep-alive.
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
         self.timeout = timeout
 
-    def _request(self, method: str, path: str, *, params: dict | None = None, data: dict | None = None) -> requests.Response:
-        url = f"{self.base_url}{path}"
-
-        max_attempts = 8
-        backoff = 2.0
-
-        for attempt in range(1, max_attempts + 1):
-            try:
-                resp = self.session.request(
-                    method,
-                    url,
-                    params=params,
-                    data=data,
-                    timeout=self.timeout,
-                )
-            except requests.RequestException as e:
-                if attempt == max_attempts:
-                    raise
-                sleep_s = min(60, backoff ** attempt * 0.25)
-                logging.warning(f"Request error ({e}); retrying in {sleep_s:.1f}s (attempt {attempt}/{max_attempts})")
-                time.sleep(sleep_s)
-                continue
-
-            if resp.status_code == 429:
-                retry_after = resp.headers.get("Retry-After")
-                sleep_s = int(retry_after) + 1 if (retry_after and retry_after.isdigit()) else min(60, int(backoff ** attempt))
-                logging.warning(f"Rate limited (429). Sleeping {sleep_s}s then retrying (attempt {attempt}/{max_attempts})")
-                time.sleep(sleep_s)
-                continue
-
-            if 500 <= resp.status_code <= 599:
-                if attempt == max_attempts:
-                    return resp
-                sleep_s = min(60, backoff ** attempt * 0.25)
-                logging.warning(f"Server error {resp.status_code}. Sleeping {sleep_s:.1f}s then retrying (attempt {attempt}/{max_attempts})")
-                time.sleep(sleep_s)
-                continue
-
-            return resp
-
-        return resp  # unreachable
+    def _url(self, path: str) -> str:
+        # Pagination hands back absolute "next" URLs; everything else is a path under base_url.
+        return path if path.startswith(("http://", "https://")) else f"{self.base_url}{path}"
+
+    def _request(self, method: str, path: str, *, params: dict | None = None, data: dict | None = None, headers: dict | None = None) -> requests.Response:
+        return self.session.request(
+            method,
+            self._url(path),
+            params=params,
+            data=data,
+            headers=headers,
+            timeout=self.timeout,
+        )
 
     @staticmethod
     def _parse_link_header(link_header: str) -> Dict[str, str]:
@@ -175,92 +308,151 @@ class CanvasClient:
                 links[rel] = url
         return links
 
-    def _get_paginated(self, path: str, *, params: dict | None = None) -> Iterable[Dict[str, Any]]:
-        resp = self._request("GET", path, params=params)
+    def _cached_page(self, url: str) -> Tuple[Optional[CachedPage], Dict[str, str]]:
+        """Look up a cached page and build the validator headers for a conditional GET."""
+        cached = self.cache.get(url) if self.cache is not None else None
+        headers: Dict[str, str] = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+        return cached, headers
+
+    def _read_page(self, url: str, resp: requests.Response, cached: Optional[CachedPage]) -> Tuple[Any, Optional[str]]:
+        """Return (parsed body, next page URL), replaying the cache on 304 and storing fresh pages."""
+        if resp.status_code == 304 and cached is not None:
+            return json_loads(cached.body), cached.next_url
+
+        next_url = self._parse_link_header(resp.headers.get("Link", "")).get("next")
+        etag = resp.headers.get("ETag")
+        last_modified = resp.headers.get("Last-Modified")
+        if self.cache is not None and (etag or last_modified):
+            self.cache.put(url, CachedPage(etag, last_modified, resp.content, next_url))
+        return json_loads(resp.content), next_url
+
+    def _get_page(self, path: str, *, params: dict | None = None) -> Tuple[Any, Optional[str]]:
+        """GET one page (path or absolute URL); returns (parsed body, next page URL)."""
+        url = requests.Request("GET", self._url(path), params=params).prepare().url
+        cached, headers = self._cached_page(url)
+        resp = self._request("GET", url, headers=headers)
         if not resp.ok:
             raise RuntimeError(f"GET {path} failed: {resp.status_code} {resp.text}")
+        return self._read_page(url, resp, cached)
+
+    def _get_paginated(self, path: str, *, params: dict | None = None) -> Iterator[Dict[str, Any]]:
+        data, next_url = self._get_page(path, params=params)
+
+        # Download page N+1 on a helper thread while the caller consumes page N.
+        # Next URLs already carry the query string, so params apply to the first page only.
+        with ThreadPoolExecutor(max_workers=1) as prefetch:
+            while True:
+                upcoming = prefetch.submit(self._get_page, next_url) if next_url else None
+                if isinstance(data, list):
+                    for item in data:
+                        yield item
+                else:
+                    yield data
+
+                if upcoming is None:
+                    break
+                data, next_url = upcoming.result()
+
+    def get_student_count(self, course_id: str) -> Optional[int]:
+        resp = self._request("GET", f"/api/v1/courses/{course_id}", params={"include[]": ["total_students"]})
+        if not resp.ok:
+            raise RuntimeError(f"GET course {course_id} failed: {resp.status_code} {resp.text}")
+        return json_loads(resp.content).get("total_students")
 
-        data = resp.json()
-        if isinstance(data, list):
-            for item in data:
-                yield item
-        else:
-            yield data
-
-        link = resp.headers.get("Link", "")
-        links = self._parse_link_header(link)
-        next_url = links.get("next")
-
-        while next_url:
-            respN = self.session.get(next_url, timeout=self.timeout)
-            if respN.status_code == 429:
-                retry_after = respN.headers.get("Retry-After")
-                sleep_s = int(retry_after) + 1 if (retry_after and retry_after.isdigit()) else 10
-                logging.warning(f"Rate limited (429) on next page. Sleeping {sleep_s}s.")
-                time.sleep(sleep_s)
-                continue
-            if not respN.ok:
-                raise RuntimeError(f"GET next page failed: {respN.status_code} {respN.text}")
-
-            dataN = respN.json()
-            if isinstance(dataN, list):
-                for item in dataN:
-                    yield item
-            else:
-                yield dataN
-
-            linkN = respN.headers.get("Link", "")
-            linksN = self._parse_link_header(linkN)
-            next_url = linksN.get("next")
-
-    def list_assignments(self, course_id: str) -> List[Dict[str, Any]]:
-        return list(self._get_paginated(
+    def list_assignments(self, course_id: str) -> Iterator[Dict[str, Any]]:
+        return self._get_paginated(
             f"/api/v1/courses/{course_id}/assignments",
             params={"per_page": 100},
-        ))
-
-    def list_submissions(self, course_id: str, assignment_id: int) -> List[Dict[str, Any]]:
-        return list(self._get_paginated(
-            f"/api/v1/courses/{course_id}/assignments/{assignment_id}/submissions",
-            params={"per_page": 100, "include[]": ["user"]},
-        ))
+        )
 
-    def update_submission_grade(self, course_id: str, assignment_id: int, user_id: int, posted_grade: str) -> None:
+    def list_submissions_bulk(self, course_id: str, assignment_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+        """Fetch submissions for several assignments in one paginated stream, grouped by assignment id."""
+        grouped: Dict[int, List[Dict[str, Any]]] = {int(aid): [] for aid in assignment_ids}
+        for s in self._get_paginated(
+            f"/api/v1/courses/{course_id}/students/submissions",
+            params={
+                "per_page": 100,
+                "student_ids[]": ["all"],
+                "assignment_ids[]": list(assignment_ids),
+                "include[]": ["user"],
+            },
+        ):
+            grouped.setdefault(int(s["assignment_id"]), []).append(s)
+        return grouped
+
+    def bulk_update_grades(self, course_id: str, assignment_id: int, user_to_grade: Dict[int, str]) -> Dict[str, Any]:
+        """Queue posted grades for many users in one request; returns the Canvas Progress object."""
         resp = self._request(
-            "PUT",
-            f"/api/v1/courses/{course_id}/assignments/{assignment_id}/submissions/{user_id}",
-            data={"submission[posted_grade]": posted_grade},
+            "POST",
+            f"/api/v1/courses/{course_id}/assignments/{assignment_id}/submissions/update_grades",
+            data={f"grade_data[{user_id}][posted_grade]": grade for user_id, grade in user_to_grade.items()},
         )
         if not resp.ok:
             raise RuntimeError(
-                f"PUT grade failed for assignment {assignment_id} user {user_id}: {resp.status_code} {resp.text}"
+                f"POST update_grades failed for assignment {assignment_id}: {resp.status_code} {resp.text}"
             )
+        return json_loads(resp.content)
 
 
 # ----------------------------
 # Business Logic
 # ----------------------------
 
+@lru_cache(maxsize=4096)
 def parse_canvas_datetime(dt_str: Optional[str]) -> Optional[datetime]:
     if not dt_str:
         return None
-    return dtparser.isoparse(dt_str)
+    # Canvas sends UTC as a trailing "Z", which fromisoformat only accepts from 3.11.
+    if dt_str.endswith("Z"):
+        dt_str = dt_str[:-1] + "+00:00"
+    return datetime.fromisoformat(dt_str)
+
+
+@lru_cache(maxsize=None)
+def _tz(name: str) -> ZoneInfo:
+    return ZoneInfo(name)
 
 
 def is_within_window(due_at: datetime, start: datetime, end: datetime) -> bool:
     return start <= due_at < end
 
 
+def format_canvas_datetime(dt: datetime) -> str:
+    return dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def is_eligible(a: Dict[str, Any], cfg: Config, start: str, end: str) -> bool:
+    """start/end are window bounds as produced by format_canvas_datetime."""
+    # Cheap field checks first; only look at due_at for assignments that pass them.
+    if cfg.assignment_group_id is not None and a.get("assignment_group_id") != cfg.assignment_group_id:
+        return False
+    if cfg.require_complete_incomplete and a.get("grading_type") != "complete_incomplete":
+        return False
+    due_at = a.get("due_at")
+    if not due_at:
+        return False
+    # Canvas normally sends fixed-width UTC ("2024-09-15T23:59:59Z"), which orders
+    # correctly as a plain string; anything else goes through a real parse.
+    if len(due_at) == 20 and due_at.endswith("Z"):
+        return start <= due_at < end
+    return is_within_window(parse_canvas_datetime(due_at), parse_canvas_datetime(start), parse_canvas_datetime(end))
+
+
 def should_run_now(cfg: Config) -> bool:
     if not cfg.enforce_thursday_5pm:
         return True
-    tz = ZoneInfo(cfg.timezone)
+    tz = _tz(cfg.timezone)
     now = datetime.now(tz)
     return (now.weekday() == 3) and (now.hour == 17) and (now.minute == 0)
 
 
 def compute_due_window(cfg: Config) -> Tuple[datetime, datetime]:
-    tz = ZoneInfo(cfg.timezone)
+    tz = _tz(cfg.timezone)
     now_local = datetime.now(tz)
     start_local = now_local - timedelta(days=(cfg.grace_days + cfg.window_days))
     end_local = now_local - timedelta(days=cfg.grace_days)
@@ -276,85 +468,141 @@ def normalize_ci_grade(value: Optional[str]) -> Optional[str]:
     return None
 
 
+def same_grade(current: Optional[str], desired: str, grading_type: Optional[str]) -> bool:
+    if grading_type == "complete_incomplete":
+        return normalize_ci_grade(current) == desired
+    # Point grades come back from Canvas as e.g. "1.0" after posting "1", so compare numerically.
+    try:
+        return current is not None and float(current) == float(desired)
+    except ValueError:
+        return False
+
+
 def main() -> int:
     cfg = load_config()
     setup_logging(cfg.log_level)
 
     if not should_run_now(cfg):
-        tz = ZoneInfo(cfg.timezone)
+        tz = _tz(cfg.timezone)
         now = datetime.now(tz)
         logging.info(f"ENFORCE_THURSDAY_5PM is on. Now is {now.isoformat()} — not Thu 5:00pm. Exiting.")
         return 0
 
     start_dt, end_dt = compute_due_window(cfg)
     logging.info(f"Due-date grading window (local {cfg.timezone}): [{start_dt.isoformat()} , {end_dt.isoformat()})")
-    logging.info(f"DRY_RUN={cfg.dry_run} | COURSE_ID={cfg.course_id} | ASSIGNMENT_GROUP_ID={cfg.assignment_group_id or 'None'}")
-
-    client = CanvasClient(cfg.canvas_base_url, cfg.canvas_token)
-
-    assignments = client.list_assignments(cfg.course_id)
-    logging.info(f"Fetched {len(assignments)} assignments from course.")
+    logging.info(f"DRY_RUN={cfg.dry_run} | COURSE_ID={cfg.course_id} | ASSIGNMENT_GROUP_ID={cfg.assignment_group_id or 'None'} | MAX_WORKERS={cfg.max_workers}")
 
+    # The cache only saves requests, so a file that can't be opened must not stop grading.
+    cache: Optional[CacheStore] = None
+    if cfg.cache_db:
+        try:
+            cache = CacheStore(cfg.cache_db)
+        except (sqlite3.Error, OSError) as e:
+            logging.warning(f"Could not open CACHE_DB {cfg.cache_db} ({e}); continuing without the response cache.")
+    if cfg.skip_unchanged and cache is None:
+        logging.warning("SKIP_UNCHANGED needs CACHE_DB; fetching every eligible assignment.")
+    snapshots = cache if cfg.skip_unchanged else None
+    # Each fetch worker may also have its next page prefetching, so allow two connections apiece.
+    client = CanvasClient(cfg.canvas_base_url, cfg.canvas_token, cache=cache, pool_size=max(32, 2 * cfg.max_workers))
+
+    window_start = format_canvas_datetime(start_dt)
+    window_end = format_canvas_datetime(end_dt)
+
+    # Assignments stream in page by page; only the eligible ones are kept, but all are counted.
+    fetched = 0
     eligible: List[Dict[str, Any]] = []
-    for a in assignments:
-        due_at = parse_canvas_datetime(a.get("due_at"))
-        if due_at is None:
-            continue
-
-        if cfg.assignment_group_id and str(a.get("assignment_group_id")) != str(cfg.assignment_group_id):
-            continue
-
-        if cfg.require_complete_incomplete and a.get("grading_type") != "complete_incomplete":
-            continue
-
-        if is_within_window(due_at, start_dt, end_dt):
+    for a in client.list_assignments(cfg.course_id):
+        fetched += 1
+        if is_eligible(a, cfg, window_start, window_end):
             eligible.append(a)
-
-    eligible.sort(key=lambda x: x.get("due_at") or "")
+    eligible.sort(key=itemgetter("due_at"))  # is_eligible guarantees due_at is set
+    logging.info(f"Fetched {fetched} assignments from course.")
     logging.info(f"Eligible assignments in window: {len(eligible)}")
 
+    student_count: Optional[int] = None
+    if snapshots is not None:
+        try:
+            student_count = client.get_student_count(cfg.course_id)
+        except Exception as e:
+            logging.warning(f"Could not read course student count ({e}); fetching every eligible assignment.")
+
+        # needs_grading_count covers new and resubmitted work, updated_at covers edits to the
+        # assignment, and the student count covers enrollment changes. Hand edits to grades show
+        # up in none of these, so snapshots also expire after SKIP_UNCHANGED_MAX_AGE_HOURS.
+        max_age = timedelta(hours=cfg.skip_unchanged_max_age_hours)
+        unchanged = {
+            int(a["id"]) for a in eligible
+            if a.get("needs_grading_count") == 0
+            and not snapshots.has_pending(int(a["id"]), a.get("updated_at"), student_count, max_age)
+        }
+        if unchanged:
+            eligible = [a for a in eligible if int(a["id"]) not in unchanged]
+            logging.info(f"Skipping {len(unchanged)} assignments unchanged since a fully graded run.")
+
     total_updates = 0
     total_skips_same = 0
     total_errors = 0
 
+    # Pull submissions for many assignments per request, fetching the chunks
+    # concurrently up front; grading decisions below still run in due-date order.
+    # Chunks are sized so every worker gets one when there are few assignments.
+    assignment_ids = [int(a["id"]) for a in eligible]
+    chunk_size = min(SUBMISSIONS_CHUNK_SIZE, max(1, math.ceil(len(assignment_ids) / cfg.max_workers)))
+    fetches: Dict[int, Any] = {}
+    with ThreadPoolExecutor(max_workers=cfg.max_workers) as pool:
+        for i in range(0, len(assignment_ids), chunk_size):
+            chunk = assignment_ids[i:i + chunk_size]
+            fetch = pool.submit(client.list_submissions_bulk, cfg.course_id, chunk)
+            fetches.update((aid, fetch) for aid in chunk)
+    failed_fetches: Set[Any] = set()
+
     for a in eligible:
         assignment_id = int(a["id"])
         name = a.get("name", f"(assignment {assignment_id})")
         logging.info(f"Processing assignment {assignment_id}: {name} | due_at={a.get('due_at')}")
 
+        fetch = fetches[assignment_id]
         try:
-            submissions = client.list_submissions(cfg.course_id, assignment_id)
+            submissions = fetch.result()[assignment_id]
         except Exception as e:
             total_errors += 1
-            logging.exception(f"Failed to fetch submissions for assignment {assignment_id}: {e}")
+            # A failed chunk fails every assignment in it; show its traceback only once.
+            if fetch not in failed_fetches:
+                failed_fetches.add(fetch)
+                chunk = [aid for aid, f in fetches.items() if f is fetch]
+                logging.exception(f"Submissions request for assignments {chunk} failed: {e}")
+            logging.error(f"Failed to fetch submissions for assignment {assignment_id}: {e}")
             continue
 
         updates_for_assignment = 0
         skips_for_assignment = 0
+        grades_to_post: Dict[int, str] = {}
 
         for s in submissions:
             user_id = s.get("user_id")
             if user_id is None:
                 continue
 
-            submitted_at = parse_canvas_datetime(s.get("submitted_at"))
-            #desired = "complete" if submitted_at is not None else "incomplete"
-            
+            # Only presence matters (lateness is ignored), so there is no need to parse the timestamp.
+            submitted = bool(s.get("submitted_at"))
+
             # Decide what to post based on assignment grading_type
             grading_type = a.get("grading_type")
             points_possible = a.get("points_possible")
 
             if grading_type == "complete_incomplete":
-                desired = "complete" if submitted_at is not None else "incomplete"
+                desired = "complete" if submitted else "incomplete"
             else:
                 # For point-based completion (e.g., 0/1), post numeric points:
                 # Complete -> full points, Incomplete -> 0
                 full_points = int(points_possible) if points_possible is not None else 1
-                desired = str(full_points) if submitted_at is not None else "0"
+                desired = str(full_points) if submitted else "0"
 
 
-            current = normalize_ci_grade(s.get("posted_grade")) or normalize_ci_grade(s.get("grade"))
-            if current == desired:
+            # After a resubmission the old grade no longer matches the current attempt and Canvas
+            # keeps counting it in needs_grading_count; re-post so the grade attaches to it.
+            current = s.get("posted_grade") or s.get("grade")
+            if same_grade(current, desired, grading_type) and s.get("grade_matches_current_submission", True):
                 skips_for_assignment += 1
                 continue
 
@@ -363,12 +611,29 @@ def main() -> int:
                 logging.info(f"[DRY_RUN] Would set user {user_id} -> {desired} (submitted_at={s.get('submitted_at')})")
                 continue
 
+            grades_to_post[int(user_id)] = desired
+
+        # One update_grades call per assignment instead of a PUT per student.
+        # Canvas applies it as a background job; the next run re-checks the grades.
+        if grades_to_post:
             try:
-                client.update_submission_grade(cfg.course_id, assignment_id, int(user_id), desired)
-                updates_for_assignment += 1
+                progress = client.bulk_update_grades(cfg.course_id, assignment_id, grades_to_post)
+                updates_for_assignment += len(grades_to_post)
+                logging.info(
+                    f"Queued {len(grades_to_post)} grade updates for assignment {assignment_id} "
+                    f"(progress {progress.get('id')}: {progress.get('workflow_state')})"
+                )
             except Exception as e:
                 total_errors += 1
-                logging.exception(f"Failed to update grade for assignment {assignment_id} user {user_id}: {e}")
+                logging.exception(f"Failed to update grades for assignment {assignment_id}: {e}")
+
+        # Only snapshot once a run sees every grade already in place; a run that queues
+        # updates leaves the assignment to be verified on the next one.
+        if snapshots is not None:
+            if updates_for_assignment > 0 or grades_to_post:
+                snapshots.clear_snapshot(assignment_id)
+            else:
+                snapshots.save_snapshot(assignment_id, a.get("updated_at"), student_count)
 
         total_updates += updates_for_assignment
         total_skips_same += skips_for_assignment
@@ -376,6 +641,9 @@ def main() -> int:
             f"Done assignment {assignment_id}: updates={updates_for_assignment}, unchanged_skips={skips_for_assignment}, submissions={len(submissions)}"
         )
 
+    if cache is not None:
+        cache.prune_pages()
+
     logging.info("----- Summary -----")
     logging.info(f"Assignments processed: {len(eligible)}")
     logging.info(f"Total updates: {total_updates} {'(DRY_RUN)' if cfg.dry_run else ''}")
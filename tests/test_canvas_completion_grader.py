@@ -0,0 +1,136 @@
+"""Unit tests for the pure helpers in canvas_completion_grader.
+
+Run from the repository root:
+
+    python -m unittest discover tests
+"""
+
+from __future__ import annotations
+
+import unittest
+from datetime import timedelta
+from unittest import mock
+
+from urllib3.exceptions import MaxRetryError
+from urllib3.response import HTTPResponse
+
+import canvas_completion_grader as ccg
+
+
+def _response(status: int, retry_after: str | None = None) -> HTTPResponse:
+    headers = {"Retry-After": retry_after} if retry_after is not None else {}
+    return HTTPResponse(body=b"", headers=headers, status=status)
+
+
+class ScheduledRetryTests(unittest.TestCase):
+    def setUp(self) -> None:
+        # Exercise the retry exactly as the client mounts it on its adapter.
+        client = ccg.CanvasClient("https://canvas.example.edu", "token")
+        self.retry = client.session.get_adapter("https://canvas.example.edu").max_retries
+
+    def test_backoff_follows_schedule_then_gives_up(self) -> None:
+        retry = self.retry
+        self.assertIsInstance(retry, ccg._ScheduledRetry)
+        self.assertEqual(retry.get_backoff_time(), 0)
+        with self.assertLogs(level="WARNING"):
+            for n, expected in enumerate(ccg._BACKOFF, start=1):
+                retry = retry.increment("GET", "/api/v1/x", response=_response(502))
+                self.assertIsInstance(retry, ccg._ScheduledRetry)
+                self.assertEqual(len(retry.history), n)
+                self.assertEqual(retry.get_backoff_time(), expected)
+        with self.assertRaises(MaxRetryError):
+            retry.increment("GET", "/api/v1/x", response=_response(502))
+
+    def test_retry_after_takes_precedence_over_schedule(self) -> None:
+        with self.assertLogs(level="WARNING") as logs:
+            retry = self.retry.increment("GET", "/api/v1/x", response=_response(429, "7"))
+        self.assertIn("status 429; retrying in 7.0s (retry 1)", logs.output[0])
+
+        with mock.patch("urllib3.util.retry.time.sleep") as sleep:
+            retry.sleep(_response(429, "7"))
+        sleep.assert_called_once_with(7.0)
+
+        with mock.patch("urllib3.util.retry.time.sleep") as sleep:
+            retry.sleep(_response(429))
+        sleep.assert_called_once_with(ccg._BACKOFF[0])
+
+
+class IsEligibleTests(unittest.TestCase):
+    START = "2024-09-10T00:00:00Z"
+    END = "2024-09-17T00:00:00Z"
+
+    def eligible(self, due_at, grading_type="complete_incomplete", **cfg_fields) -> bool:
+        cfg = ccg.Config("https://canvas.example.edu", "token", "1", **cfg_fields)
+        assignment = {"due_at": due_at, "grading_type": grading_type, "assignment_group_id": 5}
+        return ccg.is_eligible(assignment, cfg, self.START, self.END)
+
+    def test_utc_string_compare_is_half_open(self) -> None:
+        self.assertTrue(self.eligible("2024-09-10T00:00:00Z"))
+        self.assertTrue(self.eligible("2024-09-16T23:59:59Z"))
+        self.assertFalse(self.eligible("2024-09-17T00:00:00Z"))
+        self.assertFalse(self.eligible("2024-09-09T23:59:59Z"))
+
+    def test_other_formats_are_parsed(self) -> None:
+        # Plain string order would get both of these wrong.
+        self.assertFalse(self.eligible("2024-09-16T20:00:00-06:00"))  # 2024-09-17T02:00Z
+        self.assertFalse(self.eligible("2024-09-17T00:00:00.000Z"))
+        self.assertTrue(self.eligible("2024-09-16T17:59:59-06:00"))
+        self.assertTrue(self.eligible("2024-09-16T23:59:59.500Z"))
+
+    def test_field_filters(self) -> None:
+        self.assertFalse(self.eligible(None))
+        self.assertFalse(self.eligible("2024-09-15T12:00:00Z", grading_type="points"))
+        self.assertTrue(self.eligible("2024-09-15T12:00:00Z", grading_type="points", require_complete_incomplete=False))
+        self.assertFalse(self.eligible("2024-09-15T12:00:00Z", assignment_group_id=6))
+        self.assertTrue(self.eligible("2024-09-15T12:00:00Z", assignment_group_id=5))
+
+
+class SameGradeTests(unittest.TestCase):
+    def test_complete_incomplete_ignores_case_and_whitespace(self) -> None:
+        self.assertTrue(ccg.same_grade("Complete ", "complete", "complete_incomplete"))
+        self.assertFalse(ccg.same_grade("complete", "incomplete", "complete_incomplete"))
+        self.assertFalse(ccg.same_grade("1", "complete", "complete_incomplete"))
+        self.assertFalse(ccg.same_grade(None, "incomplete", "complete_incomplete"))
+
+    def test_points_compare_numerically(self) -> None:
+        self.assertTrue(ccg.same_grade("1.0", "1", "points"))
+        self.assertTrue(ccg.same_grade("0", "0", None))
+        self.assertFalse(ccg.same_grade("0.5", "1", "points"))
+
+    def test_missing_or_non_numeric_points_are_regraded(self) -> None:
+        # An ungraded submission must still receive its 0.
+        self.assertFalse(ccg.same_grade(None, "0", "points"))
+        self.assertFalse(ccg.same_grade("A-", "1", "letter_grade"))
+
+
+class HasPendingTests(unittest.TestCase):
+    UPDATED = "2024-09-01T00:00:00Z"
+    DAY = timedelta(hours=24)
+
+    def setUp(self) -> None:
+        self.cache = ccg.CacheStore(":memory:")
+        self.cache.save_snapshot(1, self.UPDATED, 60)
+
+    def test_current_snapshot_means_nothing_pending(self) -> None:
+        self.assertFalse(self.cache.has_pending(1, self.UPDATED, 60, self.DAY))
+
+    def test_missing_or_cleared_snapshot_is_pending(self) -> None:
+        self.assertTrue(self.cache.has_pending(2, self.UPDATED, 60, self.DAY))
+        self.cache.clear_snapshot(1)
+        self.assertTrue(self.cache.has_pending(1, self.UPDATED, 60, self.DAY))
+
+    def test_any_changed_signal_is_pending(self) -> None:
+        self.assertTrue(self.cache.has_pending(1, "2024-09-02T00:00:00Z", 60, self.DAY))
+        self.assertTrue(self.cache.has_pending(1, self.UPDATED, 61, self.DAY))
+        self.assertTrue(self.cache.has_pending(1, self.UPDATED, 59, self.DAY))
+        self.assertTrue(self.cache.has_pending(1, self.UPDATED, 60, timedelta(seconds=-1)))
+
+    def test_unknown_signals_are_pending(self) -> None:
+        self.assertTrue(self.cache.has_pending(1, None, 60, self.DAY))
+        self.assertTrue(self.cache.has_pending(1, self.UPDATED, None, self.DAY))
+        self.cache.save_snapshot(3, None, None)
+        self.assertTrue(self.cache.has_pending(3, self.UPDATED, 60, self.DAY))
+
+
+if __name__ == "__main__":
+    unittest.main()